@@ -0,0 +1,184 @@
+import threading
+import time
+from collections import deque
+
+
+# Priority classes, lower value is sent first
+PRIORITY_SAFETY = 0     # LAND, RTL
+PRIORITY_MODE = 1       # mode changes, arm/disarm, takeoff
+PRIORITY_SETPOINT = 2   # NED position / yaw setpoints
+PRIORITY_BULK = 3       # parameters, missions
+
+PRIORITY_NAMES = ['safety', 'mode', 'setpoint', 'bulk']
+
+# Minimum interval between two sends of the same class, in seconds
+DEFAULT_RATE_LIMITS = {
+    PRIORITY_SAFETY: 0.0,
+    PRIORITY_MODE: 0.05,
+    PRIORITY_SETPOINT: 0.05,
+    PRIORITY_BULK: 0.2,
+}
+
+
+class _Command:
+    __slots__ = ('send', 'key', 'enqueued_at')
+
+    def __init__(self, send, key, enqueued_at):
+        self.send = send
+        self.key = key
+        self.enqueued_at = enqueued_at
+
+
+class CommandScheduler:
+    """
+    Outbound command queue for a single vehicle link.
+
+    Commands are callables that perform the actual send. They are drained by
+    one background thread, highest priority class first, with a per-class
+    rate limit. A setpoint submitted with a key replaces any pending setpoint
+    with the same key, and a safety command drops everything queued below it
+    so a LAND or RTL is never overridden by an earlier mode change or a stale
+    position target.
+    """
+
+    def __init__(self, name="link", rate_limits=None):
+        self.name = name
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS)
+        if rate_limits:
+            self.rate_limits.update(rate_limits)
+
+        self._queues = [deque() for _ in PRIORITY_NAMES]
+        self._pending_keys = [{} for _ in PRIORITY_NAMES]
+        self._last_sent = [0.0 for _ in PRIORITY_NAMES]
+        self._stats = [self._empty_stats() for _ in PRIORITY_NAMES]
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    @staticmethod
+    def _empty_stats():
+        return {'sent': 0, 'coalesced': 0, 'dropped': 0, 'failed': 0,
+                'wait_total': 0.0, 'wait_max': 0.0}
+
+    def start(self):
+        """Start the sender thread"""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"scheduler-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """
+        Stop the sender thread. Queued safety commands are still sent (within
+        timeout), anything else still queued is discarded.
+        """
+        with self._condition:
+            self._running = False
+            for priority in range(PRIORITY_SAFETY + 1, len(PRIORITY_NAMES)):
+                self._drop_locked(priority)
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._condition:
+            self._drop_locked(PRIORITY_SAFETY)
+
+    def submit(self, send, priority, key=None):
+        """
+        Queue a send callable in the given priority class.
+        Returns False if the scheduler is not running.
+        """
+        with self._condition:
+            if not self._running:
+                return False
+
+            if priority == PRIORITY_SAFETY:
+                for lower in range(PRIORITY_SAFETY + 1, len(PRIORITY_NAMES)):
+                    self._drop_locked(lower)
+
+            pending = self._pending_keys[priority]
+            if key is not None and key in pending:
+                # Coalesce: keep the queue slot, send the newest data
+                pending[key].send = send
+                self._stats[priority]['coalesced'] += 1
+            else:
+                command = _Command(send, key, time.monotonic())
+                self._queues[priority].append(command)
+                if key is not None:
+                    pending[key] = command
+            self._condition.notify()
+        return True
+
+    def _drop_locked(self, priority):
+        queue = self._queues[priority]
+        self._stats[priority]['dropped'] += len(queue)
+        queue.clear()
+        self._pending_keys[priority].clear()
+
+    def _next_locked(self, now):
+        """Return (command, priority) ready to send, or (None, seconds to wait)"""
+        wait = None
+        for priority, queue in enumerate(self._queues):
+            if not queue:
+                continue
+            ready_at = self._last_sent[priority] + self.rate_limits.get(priority, 0.0)
+            if ready_at <= now:
+                command = queue.popleft()
+                if command.key is not None:
+                    self._pending_keys[priority].pop(command.key, None)
+                return command, priority
+            if wait is None or ready_at - now < wait:
+                wait = ready_at - now
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    # Once stopped, only the remaining safety commands are sent
+                    if not self._running and not self._queues[PRIORITY_SAFETY]:
+                        return
+                    now = time.monotonic()
+                    command, result = self._next_locked(now)
+                    if command is not None:
+                        priority = result
+                        self._last_sent[priority] = now
+                        break
+                    self._condition.wait(result)
+
+            try:
+                command.send()
+                failed = False
+            except Exception as e:
+                print(f"[{self.name}] Failed to send {PRIORITY_NAMES[priority]} command: {str(e)}")
+                failed = True
+
+            waited = now - command.enqueued_at
+            with self._condition:
+                stats = self._stats[priority]
+                if failed:
+                    stats['failed'] += 1
+                else:
+                    stats['sent'] += 1
+                stats['wait_total'] += waited
+                stats['wait_max'] = max(stats['wait_max'], waited)
+
+    def metrics(self):
+        """Get queue depth and wait-time metrics per priority class"""
+        with self._condition:
+            result = {}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                stats = self._stats[priority]
+                handled = stats['sent'] + stats['failed']
+                result[name] = {
+                    'depth': len(self._queues[priority]),
+                    'sent': stats['sent'],
+                    'failed': stats['failed'],
+                    'coalesced': stats['coalesced'],
+                    'dropped': stats['dropped'],
+                    'wait_avg': stats['wait_total'] / handled if handled else 0.0,
+                    'wait_max': stats['wait_max'],
+                }
+            return result
@@ -2,6 +2,9 @@ import math
 import time
 from dronekit import connect, VehicleMode, LocationGlobalRelative
 from pymavlink import mavutil
+from command_scheduler import (CommandScheduler, PRIORITY_SAFETY, PRIORITY_MODE,
+                               PRIORITY_SETPOINT)
+from geofence import offset_position
 
 
 def calculate_bearing(location1, location2):
@@ -30,11 +33,22 @@ def yaw_to_target_with_position_control(vehicle, target_location):
     Alternative method using SET_POSITION_TARGET_LOCAL_NED with yaw control.
     This maintains current position while only changing yaw.
     """
+    msg, target_bearing = yaw_target_message(vehicle, target_location)
+    vehicle.send_mavlink(msg)
+    
+    return target_bearing
+
+
+def yaw_target_message(vehicle, target_location):
+    """
+    Build the yaw-only position target message for yaw_to_target_with_position_control.
+    Returns the message and the target bearing in radians.
+    """
     vehicle_location = vehicle.location.global_relative_frame
 
     target_bearing = calculate_bearing(vehicle_location, target_location)
     
-    # Send position target message with yaw control
+    # Position target message with yaw control
     msg = vehicle.message_factory.set_position_target_local_ned_encode(
         0, # time_boot_ms (not used)
         0, 0, # target system, target component
@@ -45,16 +59,21 @@ def yaw_to_target_with_position_control(vehicle, target_location):
         0, 0, 0, # x, y, z acceleration (ignored)
         target_bearing+math.pi, 0) # yaw (radians), yaw_rate (rad/s)
     
-    vehicle.send_mavlink(msg)
-    
-    return target_bearing
+    return msg, target_bearing
 
 
 def send_ned_position(vehicle, x, y, z):
     """
     Move vehicle to a specified position in NED coordinates.
     """
-    msg = vehicle.message_factory.set_position_target_local_ned_encode(
+    vehicle.send_mavlink(ned_position_message(vehicle, x, y, z))
+
+
+def ned_position_message(vehicle, x, y, z):
+    """
+    Build the position target message used by send_ned_position.
+    """
+    return vehicle.message_factory.set_position_target_local_ned_encode(
         0,       # time_boot_ms (not used)
         0, 0,    # target system, target component
         mavutil.mavlink.MAV_FRAME_LOCAL_OFFSET_NED, # frame
@@ -63,48 +82,139 @@ def send_ned_position(vehicle, x, y, z):
         0, 0, 0, # x, y, z velocity (not used)
         0, 0, 0, # x, y, z acceleration (not supported yet, ignored in GCS_Mavlink)
         0, 0)    # yaw, yaw_rate (not supported yet, ignored in GCS_Mavlink)
-    
-    vehicle.send_mavlink(msg)
 
 
 class DroneController:
     def __init__(self):
         self.vehicles = []
+        self.schedulers = []
         self.connection_strings = []
+        self.vehicle_numbers = {}
+        self.geofence = None
+        # Check incoming vehicle positions against the geofence
+        self.position_checks = True
+        self.breach_listeners = []
+        self._breached = []
         
-    def add_vehicle(self, connection_string):
-        """Add a vehicle connection string to the list"""
+    def add_vehicle(self, connection_string, number=None):
+        """
+        Add a vehicle connection string to the list.
+        number is the vehicle number used in logs, defaults to its position in the list.
+        """
+        if number is not None:
+            self.vehicle_numbers[len(self.connection_strings)] = number
         self.connection_strings.append(connection_string)
         
+    def set_geofence(self, geofence):
+        """Set the geofence checked against setpoints and vehicle positions (None to disable)"""
+        self.geofence = geofence
+        self._breached = [False] * len(self._breached)
+        
+    def add_breach_listener(self, callback):
+        """
+        Register a callback for geofence breaches.
+        Called as callback(vehicle_index, kind, reason) where kind is
+        'setpoint' for a rejected command or 'position' for a vehicle outside the fence.
+        """
+        self.breach_listeners.append(callback)
+        
+    def _raise_breach(self, vehicle_index, kind, reason):
+        for callback in self.breach_listeners:
+            callback(vehicle_index, kind, reason)
+            
+    def _make_position_listener(self, vehicle_index):
+        def on_position(vehicle, attr_name, location):
+            geofence = self.geofence
+            if geofence is None or not self.position_checks \
+                    or location is None or location.lat is None:
+                return
+            reason = geofence.check(location.lat, location.lon, location.alt)
+            breached = reason is not None
+            # Only report when a vehicle leaves the fence, not on every update
+            if breached and not self._breached[vehicle_index]:
+                self._raise_breach(vehicle_index, 'position', reason)
+            self._breached[vehicle_index] = breached
+        return on_position
+        
+    def _check_setpoint(self, vehicle_index, north=0, east=0, down=0, altitude=None):
+        """
+        Check a position commanded relative to the vehicle against the geofence,
+        raising a breach if rejected. altitude overrides the target altitude (for takeoff).
+        """
+        geofence = self.geofence
+        if geofence is None:
+            return True
+        location = self.vehicles[vehicle_index].location.global_relative_frame
+        if altitude is None and location is not None and location.alt is not None:
+            altitude = location.alt - down
+        if location is None or location.lat is None or location.lon is None or altitude is None:
+            reason = "no position fix"
+        else:
+            # MAV_FRAME_LOCAL_OFFSET_NED targets are relative to the current position
+            lat, lon = offset_position(location.lat, location.lon, north, east)
+            reason = geofence.check(lat, lon, altitude)
+        if reason is not None:
+            self._raise_breach(vehicle_index, 'setpoint', reason)
+            return False
+        return True
+        
     def connect_vehicles(self):
         """Connect to all vehicles in the connection list"""
         self.vehicles = []
+        self.schedulers = []
+        self._breached = [False] * len(self.connection_strings)
         for i, conn_str in enumerate(self.connection_strings):
+            number = self.vehicle_numbers.get(i, i + 1)
             try:
                 vehicle = connect(conn_str, wait_ready=True, timeout=60)
+                scheduler = CommandScheduler(f"vehicle-{number}")
+                scheduler.start()
+                vehicle.add_attribute_listener('location.global_relative_frame',
+                                               self._make_position_listener(i))
                 self.vehicles.append(vehicle)
-                print(f"Vehicle {i+1} connected successfully")
+                self.schedulers.append(scheduler)
+                print(f"Vehicle {number} connected successfully")
             except Exception as e:
-                print(f"Failed to connect to vehicle {i+1}: {str(e)}")
+                print(f"Failed to connect to vehicle {number}: {str(e)}")
                 self.vehicles.append(None)
+                self.schedulers.append(None)
         return len([v for v in self.vehicles if v is not None])
     
     def disconnect_vehicles(self):
         """Disconnect all vehicles"""
+        for scheduler in self.schedulers:
+            if scheduler:
+                scheduler.stop()
         for vehicle in self.vehicles:
             if vehicle:
                 vehicle.close()
         self.vehicles = []
+        self.schedulers = []
+        
+    def _submit(self, vehicle_index, priority, send, key=None):
+        """Queue a send on the link scheduler of a specific vehicle"""
+        return self.schedulers[vehicle_index].submit(send, priority, key)
         
-    def arm_vehicle(self, vehicle_index):
-        """Arm a specific vehicle"""
+    def _set_mode(self, vehicle_index, mode_name, priority):
+        vehicle = self.vehicles[vehicle_index]
+        def send():
+            vehicle.mode = VehicleMode(mode_name)
+        return self._submit(vehicle_index, priority, send)
+        
+    def _set_armed(self, vehicle_index, armed):
+        vehicle = self.vehicles[vehicle_index]
+        def send():
+            vehicle.armed = armed
+        return self._submit(vehicle_index, PRIORITY_MODE, send)
+        
+    def arm_vehicle(self, vehicle_index, timeout=10):
+        """Arm a specific vehicle, waiting up to timeout seconds for it to report armed"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
             vehicle = self.vehicles[vehicle_index]
-            vehicle.mode = VehicleMode("GUIDED")
-            vehicle.armed = True
+            self._set_mode(vehicle_index, "GUIDED", PRIORITY_MODE)
+            self._set_armed(vehicle_index, True)
             
             # Wait until armed
-            timeout = 10
             start_time = time.time()
             while not vehicle.armed and (time.time() - start_time) < timeout:
                 time.sleep(1)
@@ -112,29 +222,33 @@ class DroneController:
             return vehicle.armed
         return False
     
+    def disarm_vehicle(self, vehicle_index):
+        """Disarm a specific vehicle"""
+        if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
+            return self._set_armed(vehicle_index, False)
+        return False
+    
     def takeoff_vehicle(self, vehicle_index, altitude):
         """Takeoff a specific vehicle to specified altitude"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
             vehicle = self.vehicles[vehicle_index]
             if vehicle.armed:
-                vehicle.simple_takeoff(altitude)
-                return True
+                if not self._check_setpoint(vehicle_index, altitude=altitude):
+                    return False
+                return self._submit(vehicle_index, PRIORITY_MODE,
+                                    lambda: vehicle.simple_takeoff(altitude))
         return False
     
     def land_vehicle(self, vehicle_index):
         """Land a specific vehicle"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
-            vehicle = self.vehicles[vehicle_index]
-            vehicle.mode = VehicleMode("LAND")
-            return True
+            return self._set_mode(vehicle_index, "LAND", PRIORITY_SAFETY)
         return False
     
     def rtl_vehicle(self, vehicle_index):
         """Return to launch for a specific vehicle"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
-            vehicle = self.vehicles[vehicle_index]
-            vehicle.mode = VehicleMode("RTL")
-            return True
+            return self._set_mode(vehicle_index, "RTL", PRIORITY_SAFETY)
         return False
     
     def get_vehicle_status(self, vehicle_index):
@@ -151,17 +265,30 @@ class DroneController:
             }
         return None
     
+    def get_link_metrics(self, vehicle_index):
+        """Get outbound queue metrics for a specific vehicle link"""
+        if vehicle_index < len(self.schedulers) and self.schedulers[vehicle_index]:
+            return self.schedulers[vehicle_index].metrics()
+        return None
+    
     def send_ned_to_vehicle(self, vehicle_index, x, y, z):
         """Send NED position command to specific vehicle"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
-            send_ned_position(self.vehicles[vehicle_index], x, y, z)
-            return True
+            vehicle = self.vehicles[vehicle_index]
+            if not self._check_setpoint(vehicle_index, x, y, z):
+                return False
+            msg = ned_position_message(vehicle, x, y, z)
+            return self._submit(vehicle_index, PRIORITY_SETPOINT,
+                                lambda: vehicle.send_mavlink(msg), key='position')
         return False
     
     def yaw_to_target(self, vehicle_index, target_lat, target_lon):
         """Yaw vehicle to target location"""
         if vehicle_index < len(self.vehicles) and self.vehicles[vehicle_index]:
+            vehicle = self.vehicles[vehicle_index]
             target_location = LocationGlobalRelative(target_lat, target_lon, 0)
-            bearing = yaw_to_target_with_position_control(self.vehicles[vehicle_index], target_location)
-            return math.degrees(bearing)
+            msg, bearing = yaw_target_message(vehicle, target_location)
+            if self._submit(vehicle_index, PRIORITY_SETPOINT,
+                            lambda: vehicle.send_mavlink(msg), key='yaw'):
+                return math.degrees(bearing)
         return None
\ No newline at end of file
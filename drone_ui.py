@@ -5,10 +5,12 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
                            QWidget, QPushButton, QLabel, QSpinBox, QLineEdit, 
                            QTextEdit, QTabWidget, QGridLayout, QGroupBox, 
                            QComboBox, QDoubleSpinBox, QMessageBox, QTableWidget,
-                           QTableWidgetItem, QHeaderView)
+                           QTableWidgetItem, QHeaderView, QFileDialog)
 from PyQt5.QtCore import QTimer, pyqtSignal, QObject, QThread
 from PyQt5.QtGui import QFont
 from drone_controller import DroneController
+from geofence import Geofence
+from link_workers import MultiprocessDroneController
 
 
 class StatusUpdateWorker(QObject):
@@ -35,9 +37,18 @@ class StatusUpdateWorker(QObject):
 
 
 class DroneControlUI(QMainWindow):
+    # Geofence breaches are reported from vehicle threads
+    geofence_breach = pyqtSignal(int, str, str)
+    link_lost = pyqtSignal(int, str)
+    # Emitted from the connect thread with the number of connected vehicles
+    connection_finished = pyqtSignal(int)
+    
     def __init__(self):
         super().__init__()
-        self.controller = DroneController()
+        self.geofence_breach.connect(self.on_geofence_breach)
+        self.link_lost.connect(self.on_link_lost)
+        self.connection_finished.connect(self.on_connection_finished)
+        self.controller = self.create_controller(0)
         self.status_worker = None
         self.status_thread = None
         
@@ -86,6 +97,14 @@ class DroneControlUI(QMainWindow):
         generate_btn.clicked.connect(self.update_connection_fields)
         uav_layout.addWidget(generate_btn)
         
+        uav_layout.addWidget(QLabel("Link Worker Processes:"))
+        self.worker_count_spinbox = QSpinBox()
+        self.worker_count_spinbox.setMinimum(0)
+        self.worker_count_spinbox.setMaximum(16)
+        self.worker_count_spinbox.setValue(0)
+        self.worker_count_spinbox.setToolTip("0 runs all links in the UI process")
+        uav_layout.addWidget(self.worker_count_spinbox)
+        
         layout.addWidget(uav_group)
         
         # Connection strings section
@@ -259,6 +278,24 @@ class DroneControlUI(QMainWindow):
         yaw_layout.addWidget(self.yaw_to_target_btn, 2, 0, 1, 2)
         
         layout.addWidget(yaw_group)
+        
+        # Geofence
+        geofence_group = QGroupBox("Geofence")
+        geofence_layout = QHBoxLayout(geofence_group)
+        
+        self.geofence_label = QLabel("No geofence loaded")
+        geofence_layout.addWidget(self.geofence_label)
+        geofence_layout.addStretch()
+        
+        self.load_geofence_btn = QPushButton("Load Geofence...")
+        self.load_geofence_btn.clicked.connect(self.load_geofence)
+        geofence_layout.addWidget(self.load_geofence_btn)
+        
+        self.clear_geofence_btn = QPushButton("Clear Geofence")
+        self.clear_geofence_btn.clicked.connect(self.clear_geofence)
+        geofence_layout.addWidget(self.clear_geofence_btn)
+        
+        layout.addWidget(geofence_group)
         layout.addStretch()
         
         self.tab_widget.addTab(advanced_widget, "Advanced Control")
@@ -337,9 +374,21 @@ class DroneControlUI(QMainWindow):
         for i in range(count):
             self.status_table.setItem(i, 0, QTableWidgetItem(f"Vehicle {i+1}"))
         
+    def create_controller(self, workers):
+        """Create an in-process controller, or one sharding links across worker processes"""
+        if workers > 0:
+            controller = MultiprocessDroneController(workers)
+            controller.add_link_lost_listener(self.link_lost.emit)
+        else:
+            controller = DroneController()
+        controller.add_breach_listener(self.geofence_breach.emit)
+        return controller
+        
     def connect_vehicles(self):
         """Connect to all vehicles"""
-        self.controller.connection_strings.clear()
+        geofence = self.controller.geofence
+        self.controller = self.create_controller(self.worker_count_spinbox.value())
+        self.controller.set_geofence(geofence)
         
         for field in self.connection_fields:
             conn_str = field.text().strip()
@@ -351,18 +400,24 @@ class DroneControlUI(QMainWindow):
             return
             
         self.connection_status.append("Connecting to vehicles...")
+        self.worker_count_spinbox.setEnabled(False)
         
         # Connect in a separate thread to avoid freezing UI
         def connect_thread():
-            connected_count = self.controller.connect_vehicles()
-            self.connection_status.append(f"Connected to {connected_count} vehicles successfully.")
-            
-            if connected_count > 0:
-                self.connect_btn.setEnabled(False)
-                self.disconnect_btn.setEnabled(True)
+            self.connection_finished.emit(self.controller.connect_vehicles())
                 
         threading.Thread(target=connect_thread, daemon=True).start()
         
+    def on_connection_finished(self, connected_count):
+        """Update the connection controls once connecting is done"""
+        self.connection_status.append(f"Connected to {connected_count} vehicles successfully.")
+        
+        if connected_count > 0:
+            self.connect_btn.setEnabled(False)
+            self.disconnect_btn.setEnabled(True)
+        else:
+            self.worker_count_spinbox.setEnabled(True)
+        
     def disconnect_vehicles(self):
         """Disconnect all vehicles"""
         self.controller.disconnect_vehicles()
@@ -370,6 +425,7 @@ class DroneControlUI(QMainWindow):
         
         self.connect_btn.setEnabled(True)
         self.disconnect_btn.setEnabled(False)
+        self.worker_count_spinbox.setEnabled(True)
         
         # Stop status updates
         if self.status_timer.isActive():
@@ -392,8 +448,7 @@ class DroneControlUI(QMainWindow):
     def disarm_vehicle(self):
         """Disarm the selected vehicle"""
         index = self.get_selected_vehicle_index()
-        if index < len(self.controller.vehicles) and self.controller.vehicles[index]:
-            self.controller.vehicles[index].armed = False
+        if self.controller.disarm_vehicle(index):
             self.connection_status.append(f"Vehicle {index+1} disarmed.")
             
     def takeoff_vehicle(self):
@@ -474,6 +529,37 @@ class DroneControlUI(QMainWindow):
         else:
             self.connection_status.append(f"Failed to yaw Vehicle {index+1} to target.")
             
+    def load_geofence(self):
+        """Load a geofence JSON file and apply it to all vehicles"""
+        path, _ = QFileDialog.getOpenFileName(self, "Load Geofence", "", "Geofence (*.json)")
+        if not path:
+            return
+        try:
+            geofence = Geofence.from_file(path)
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", f"Failed to load geofence: {str(e)}")
+            return
+        self.controller.set_geofence(geofence)
+        self.geofence_label.setText(f"Geofence: {path}")
+        self.connection_status.append(f"Geofence loaded from {path}.")
+        
+    def clear_geofence(self):
+        """Remove the active geofence"""
+        self.controller.set_geofence(None)
+        self.geofence_label.setText("No geofence loaded")
+        self.connection_status.append("Geofence cleared.")
+        
+    def on_link_lost(self, index, reason):
+        """Report a vehicle whose link worker process died"""
+        self.connection_status.append(f"Lost Vehicle {index+1}: {reason}.")
+        
+    def on_geofence_breach(self, index, kind, reason):
+        """Report a geofence breach"""
+        if kind == 'setpoint':
+            self.connection_status.append(f"Geofence: command to Vehicle {index+1} rejected, {reason}.")
+        else:
+            self.connection_status.append(f"Geofence breach: Vehicle {index+1} {reason}.")
+            
     def toggle_auto_refresh(self):
         """Toggle automatic status refresh"""
         if self.status_timer.isActive():
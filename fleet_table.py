@@ -0,0 +1,142 @@
+import ctypes
+import math
+import time
+from multiprocessing import shared_memory
+
+
+SPIN_ATTEMPTS = 10   # reads retried immediately before yielding to the writer
+READ_ATTEMPTS = 100  # reads retried before giving up on a row
+
+
+class FleetRow(ctypes.Structure):
+    """One vehicle in the shared fleet table, guarded by a sequence counter"""
+    _fields_ = [
+        ('seq', ctypes.c_uint32),
+        ('connected', ctypes.c_uint8),
+        ('armed', ctypes.c_uint8),
+        ('gps_fix', ctypes.c_int32),
+        ('satellites', ctypes.c_int32),
+        ('mode', ctypes.c_char * 32),
+        ('altitude', ctypes.c_double),
+        ('lat', ctypes.c_double),
+        ('lon', ctypes.c_double),
+        ('battery', ctypes.c_double),
+    ]
+
+
+class RowUnreadable(Exception):
+    """A fleet table row stayed mid-update for every read attempt"""
+
+
+def _status_of(row):
+    if not row.connected:
+        return None
+    return {
+        'armed': bool(row.armed),
+        'mode': row.mode.decode(),
+        'altitude': row.altitude,
+        'battery': row.battery,
+        'gps_fix': row.gps_fix,
+        'satellites': row.satellites,
+        'lat': None if math.isnan(row.lat) else row.lat,
+        'lon': None if math.isnan(row.lon) else row.lon,
+    }
+
+
+def _position_of(row):
+    if not row.connected or math.isnan(row.lat) or math.isnan(row.lon):
+        return None
+    return row.lat, row.lon, row.altitude
+
+
+class FleetTable:
+    """
+    Fixed-size vehicle state table in shared memory.
+
+    Each row has a single writer (the worker owning the link). Writers bump
+    the row sequence to an odd value while updating it, readers retry until
+    they see the same even sequence before and after reading the fields.
+    Reads give up after READ_ATTEMPTS so a writer that died mid-update
+    cannot hang the reader.
+    Readers access the mapped buffer directly, nothing is pickled or copied
+    between processes.
+    """
+
+    def __init__(self, size, name=None):
+        self.size = size
+        nbytes = max(ctypes.sizeof(FleetRow) * size, 1)
+        self.owner = name is None
+        if self.owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self.rows = (FleetRow * size).from_buffer(self._shm.buf)
+
+    def write(self, index, status):
+        """Publish a status dict (as returned by get_vehicle_status, plus lat/lon)"""
+        row = self.rows[index]
+        # Odd while writing, also when a previous writer died half way through
+        row.seq |= 1
+        if status is None:
+            row.connected = 0
+        else:
+            row.connected = 1
+            row.armed = 1 if status['armed'] else 0
+            row.mode = status['mode'].encode()[:31]
+            row.altitude = status['altitude'] or 0
+            row.battery = status['battery'] or 0
+            row.gps_fix = status['gps_fix'] or 0
+            row.satellites = status['satellites'] or 0
+            row.lat = status['lat'] if status['lat'] is not None else math.nan
+            row.lon = status['lon'] if status['lon'] is not None else math.nan
+        row.seq += 1
+
+    def _read_row(self, index, read_fields):
+        """
+        Run read_fields(row) until it sees a consistent row.
+        Raises RowUnreadable if no consistent read was possible (e.g. the
+        writer died in the middle of an update).
+        """
+        row = self.rows[index]
+        for attempt in range(READ_ATTEMPTS):
+            seq = row.seq
+            if not seq & 1:
+                result = read_fields(row)
+                if row.seq == seq:
+                    return result
+            if attempt >= SPIN_ATTEMPTS:
+                # Let the writer run before retrying
+                time.sleep(0)
+        raise RowUnreadable(f"fleet table row {index} is being written")
+
+    def read(self, index):
+        """
+        Get a consistent status dict for a vehicle, None if it is not connected.
+        Raises RowUnreadable if no consistent read was possible.
+        """
+        return self._read_row(index, _status_of)
+
+    def positions(self):
+        """
+        Get (lat, lon, alt) for every vehicle, for whole-fleet checks.
+        Entries are None for vehicles that are disconnected, have no position
+        or could not be read consistently this time.
+        """
+        positions = []
+        for index in range(self.size):
+            try:
+                positions.append(self._read_row(index, _position_of))
+            except RowUnreadable:
+                positions.append(None)
+        return positions
+
+    def is_connected(self, index):
+        return bool(self.rows[index].connected)
+
+    def close(self):
+        # The ctypes view must be released before the mapping can be closed
+        del self.rows
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
@@ -0,0 +1,251 @@
+import json
+import math
+
+
+EARTH_RADIUS = 6378137.0  # metres
+
+
+def offset_position(lat, lon, north, east):
+    """
+    Get the latitude/longitude that is north/east metres away from a point.
+    Good enough for the short distances used by NED setpoints.
+    """
+    dlat = north / EARTH_RADIUS
+    dlon = east / (EARTH_RADIUS * math.cos(math.radians(lat)))
+    return lat + math.degrees(dlat), lon + math.degrees(dlon)
+
+
+def _ray_cast(x, y, edges):
+    """Even-odd point in polygon test over a list of (x1, y1, x2, y2) edges"""
+    inside = False
+    for x1, y1, x2, y2 in edges:
+        if (y1 > y) != (y2 > y):
+            if x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                inside = not inside
+    return inside
+
+
+class Geofence:
+    """
+    Inclusion/exclusion polygons plus altitude limits.
+
+    Polygons are lists of (lat, lon) vertices. They are projected to a local
+    metric plane and indexed with a uniform grid: every cell stores, per
+    polygon touching it, whether the cell is fully inside or crosses the
+    polygon boundary. A point lookup is one cell fetch, and only boundary
+    cells need a ray cast, restricted to the edges spanning that grid row.
+    """
+
+    def __init__(self, inclusion=(), exclusion=(), min_altitude=None, max_altitude=None,
+                 grid_size=64):
+        self.min_altitude = min_altitude
+        self.max_altitude = max_altitude
+        self.grid_size = grid_size
+
+        inclusion = [list(polygon) for polygon in inclusion]
+        exclusion = [list(polygon) for polygon in exclusion]
+        for polygon in inclusion + exclusion:
+            if len(polygon) < 3:
+                raise ValueError("Geofence polygons need at least 3 vertices")
+
+        # Polygon index -> True for inclusion zones, False for exclusion zones
+        self._inclusion_flags = [True] * len(inclusion) + [False] * len(exclusion)
+        self.has_inclusion = bool(inclusion)
+
+        vertices = [vertex for polygon in inclusion + exclusion for vertex in polygon]
+        if vertices:
+            self.origin_lat = sum(v[0] for v in vertices) / len(vertices)
+            self.origin_lon = sum(v[1] for v in vertices) / len(vertices)
+        else:
+            self.origin_lat = self.origin_lon = 0.0
+        # Metres per degree along each axis at the origin
+        self._x_scale = math.radians(EARTH_RADIUS * math.cos(math.radians(self.origin_lat)))
+        self._y_scale = math.radians(EARTH_RADIUS)
+
+        self._build_index([[self._project(lat, lon) for lat, lon in polygon]
+                           for polygon in inclusion + exclusion])
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a geofence from a JSON file:
+        {"inclusion": [[[lat, lon], ...]], "exclusion": [...],
+         "min_altitude": 0, "max_altitude": 120}
+        """
+        with open(path) as f:
+            data = json.load(f)
+        return cls(inclusion=data.get('inclusion', ()),
+                   exclusion=data.get('exclusion', ()),
+                   min_altitude=data.get('min_altitude'),
+                   max_altitude=data.get('max_altitude'))
+
+    def _project(self, lat, lon):
+        """Project lat/lon to (east, north) metres around the fence origin"""
+        return ((lon - self.origin_lon) * self._x_scale,
+                (lat - self.origin_lat) * self._y_scale)
+
+    def _build_index(self, polygons):
+        n = self.grid_size
+        self._cells = [()] * (n * n)
+        self._row_edges = []
+        if not polygons:
+            self._min_x = self._min_y = 0.0
+            self._max_x = self._max_y = -1.0
+            self._cell_w = self._cell_h = 1.0
+            return
+
+        xs = [x for polygon in polygons for x, _ in polygon]
+        ys = [y for polygon in polygons for _, y in polygon]
+        self._min_x, self._min_y = min(xs), min(ys)
+        self._max_x, self._max_y = max(xs), max(ys)
+        self._cell_w = max((self._max_x - self._min_x) / n, 1e-6)
+        self._cell_h = max((self._max_y - self._min_y) / n, 1e-6)
+
+        cells = [[] for _ in range(n * n)]
+        for index, polygon in enumerate(polygons):
+            edges = [polygon[i] + polygon[(i + 1) % len(polygon)] for i in range(len(polygon))]
+
+            # Edges overlapping each grid row, used for boundary cell ray casts
+            row_edges = [[] for _ in range(n)]
+            boundary = set()
+            for edge in edges:
+                x1, y1, x2, y2 = edge
+                col0, row0 = self._cell_of(min(x1, x2), min(y1, y2))
+                col1, row1 = self._cell_of(max(x1, x2), max(y1, y2))
+                for row in range(row0, row1 + 1):
+                    row_edges[row].append(edge)
+                    for col in range(col0, col1 + 1):
+                        boundary.add(row * n + col)
+            self._row_edges.append(row_edges)
+
+            col0, row0 = self._cell_of(min(x for x, _ in polygon), min(y for _, y in polygon))
+            col1, row1 = self._cell_of(max(x for x, _ in polygon), max(y for _, y in polygon))
+            for row in range(row0, row1 + 1):
+                center_y = self._min_y + (row + 0.5) * self._cell_h
+                for col in range(col0, col1 + 1):
+                    cell = row * n + col
+                    if cell in boundary:
+                        cells[cell].append((index, False))
+                    else:
+                        center_x = self._min_x + (col + 0.5) * self._cell_w
+                        if _ray_cast(center_x, center_y, row_edges[row]):
+                            cells[cell].append((index, True))
+
+        self._cells = [tuple(entries) for entries in cells]
+
+    def _cell_of(self, x, y):
+        n = self.grid_size
+        col = min(max(int((x - self._min_x) / self._cell_w), 0), n - 1)
+        row = min(max(int((y - self._min_y) / self._cell_h), 0), n - 1)
+        return col, row
+
+    def _cell_at(self, x, y):
+        """Get the grid cell index of a projected point, or None outside the index"""
+        if not (self._min_x <= x <= self._max_x and self._min_y <= y <= self._max_y):
+            return None
+        n = self.grid_size
+        col = min(int((x - self._min_x) / self._cell_w), n - 1)
+        row = min(int((y - self._min_y) / self._cell_h), n - 1)
+        return row * n + col
+
+    def _zones_at(self, x, y):
+        """Get (in_inclusion, in_exclusion) for a projected point"""
+        cell = self._cell_at(x, y)
+        if cell is None:
+            return False, False
+        row = cell // self.grid_size
+
+        in_inclusion = in_exclusion = False
+        for index, fully_inside in self._cells[cell]:
+            if fully_inside or _ray_cast(x, y, self._row_edges[index][row]):
+                if self._inclusion_flags[index]:
+                    in_inclusion = True
+                else:
+                    in_exclusion = True
+        return in_inclusion, in_exclusion
+
+    def _altitude_breach(self, alt):
+        if alt is not None:
+            if self.max_altitude is not None and alt > self.max_altitude:
+                return f"altitude {alt:.1f}m above limit {self.max_altitude:.1f}m"
+            if self.min_altitude is not None and alt < self.min_altitude:
+                return f"altitude {alt:.1f}m below limit {self.min_altitude:.1f}m"
+        return None
+
+    def _zone_breach(self, in_inclusion, in_exclusion):
+        if in_exclusion:
+            return "inside exclusion zone"
+        if self.has_inclusion and not in_inclusion:
+            return "outside inclusion zone"
+        return None
+
+    def check(self, lat, lon, alt=None):
+        """
+        Check a position against the fence.
+        Returns None if the position is allowed, otherwise the breach reason.
+        """
+        reason = self._altitude_breach(alt)
+        if reason is not None:
+            return reason
+        x, y = self._project(lat, lon)
+        return self._zone_breach(*self._zones_at(x, y))
+
+    def check_positions(self, positions):
+        """
+        Check a whole fleet at once.
+        positions is a sequence of (lat, lon, alt) tuples, entries may be None
+        for vehicles without a position. Returns one breach reason (or None)
+        per entry, the same as check() would for each of them.
+
+        Points are bucketed by grid cell first, so each cell's polygon entries
+        and row edges are looked up once for all the vehicles inside it.
+        """
+        results = [None] * len(positions)
+        buckets = {}
+        # Projection, altitude limits and cell lookup inlined for the hot loop
+        origin_lat, origin_lon = self.origin_lat, self.origin_lon
+        x_scale, y_scale = self._x_scale, self._y_scale
+        min_alt = self.min_altitude if self.min_altitude is not None else -math.inf
+        max_alt = self.max_altitude if self.max_altitude is not None else math.inf
+        min_x, min_y, max_x, max_y = self._min_x, self._min_y, self._max_x, self._max_y
+        cell_w, cell_h, last = self._cell_w, self._cell_h, self.grid_size - 1
+        for i, position in enumerate(positions):
+            if position is None:
+                continue
+            lat, lon, alt = position
+            if alt is not None and not min_alt <= alt <= max_alt:
+                results[i] = self._altitude_breach(alt)
+                continue
+            x = (lon - origin_lon) * x_scale
+            y = (lat - origin_lat) * y_scale
+            if min_x <= x <= max_x and min_y <= y <= max_y:
+                cell = min(int((y - min_y) / cell_h), last) * (last + 1) \
+                    + min(int((x - min_x) / cell_w), last)
+            else:
+                cell = None
+            bucket = buckets.get(cell)
+            if bucket is None:
+                buckets[cell] = bucket = []
+            bucket.append((i, x, y))
+
+        outside = self._zone_breach(False, False)
+        n = self.grid_size
+        for cell, points in buckets.items():
+            if cell is None:
+                for i, _, _ in points:
+                    results[i] = outside
+                continue
+            row = cell // n
+            # Per polygon: fully inside flag, inclusion flag and the row edges to ray cast
+            zones = [(fully_inside, self._inclusion_flags[index], self._row_edges[index][row])
+                     for index, fully_inside in self._cells[cell]]
+            for i, x, y in points:
+                in_inclusion = in_exclusion = False
+                for fully_inside, inclusion, edges in zones:
+                    if fully_inside or _ray_cast(x, y, edges):
+                        if inclusion:
+                            in_inclusion = True
+                        else:
+                            in_exclusion = True
+                results[i] = self._zone_breach(in_inclusion, in_exclusion)
+        return results
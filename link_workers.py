@@ -0,0 +1,398 @@
+import math
+import multiprocessing
+import queue
+import threading
+import time
+from dronekit import LocationGlobalRelative
+from drone_controller import DroneController, calculate_bearing
+from fleet_table import FleetTable, RowUnreadable
+
+
+STATUS_INTERVAL = 0.1   # seconds between fleet table updates in a worker
+METRICS_INTERVAL = 1.0  # seconds between link metrics reports
+FENCE_CHECK_INTERVAL = 0.5  # seconds between whole-fleet geofence checks
+READ_TIMEOUT = 0.5      # seconds to wait for a fleet table row being written
+
+
+def _link_worker(table_name, table_size, links, commands, events):
+    """
+    Worker process entry point.
+    Owns the dronekit connections for links [(global_index, connection_string), ...],
+    publishes their state into the fleet table and executes queued commands.
+    Exits when told to stop or when the parent process dies.
+    """
+    parent = multiprocessing.parent_process()
+    table = FleetTable(table_size, name=table_name)
+    controller = DroneController()
+    # Positions are checked for the whole fleet from the fleet table instead
+    controller.position_checks = False
+    local_index = {}
+    for i, (global_index, conn_str) in enumerate(links):
+        controller.add_vehicle(conn_str, number=global_index + 1)
+        local_index[global_index] = i
+
+    controller.add_breach_listener(
+        lambda i, kind, reason: events.put(('breach', links[i][0], kind, reason)))
+    controller.connect_vehicles()
+
+    def publish():
+        for global_index, i in local_index.items():
+            status = controller.get_vehicle_status(i)
+            if status is not None:
+                location = controller.vehicles[i].location.global_relative_frame
+                status['lat'] = location.lat if location else None
+                status['lon'] = location.lon if location else None
+            table.write(global_index, status)
+
+    publish()
+    for global_index, i in local_index.items():
+        events.put(('connected', global_index, controller.vehicles[i] is not None))
+
+    last_status = last_metrics = time.monotonic()
+    try:
+        while parent is None or parent.is_alive():
+            try:
+                command = commands.get(timeout=STATUS_INTERVAL)
+            except queue.Empty:
+                command = None
+
+            if command is not None:
+                if command[0] == 'stop':
+                    break
+                elif command[0] == 'geofence':
+                    controller.set_geofence(command[1])
+                elif command[0] == 'call':
+                    _, global_index, method, args = command
+                    try:
+                        getattr(controller, method)(local_index[global_index], *args)
+                    except Exception as e:
+                        print(f"Vehicle {global_index+1} {method} failed: {str(e)}")
+
+            now = time.monotonic()
+            if now - last_status >= STATUS_INTERVAL:
+                publish()
+                last_status = now
+            if now - last_metrics >= METRICS_INTERVAL:
+                for global_index, i in local_index.items():
+                    metrics = controller.get_link_metrics(i)
+                    if metrics is not None:
+                        events.put(('metrics', global_index, metrics))
+                last_metrics = now
+    finally:
+        controller.disconnect_vehicles()
+        for global_index in local_index:
+            table.write(global_index, None)
+        table.close()
+
+
+class MultiprocessDroneController:
+    """
+    DroneController replacement that shards vehicle links across worker processes.
+
+    Each worker parses MAVLink and sends commands for its own links, so the GUI
+    process no longer shares a GIL with the link traffic. Vehicle state is read
+    from a shared memory FleetTable and commands are forwarded over per-worker
+    queues. Commands are asynchronous: the return value only says whether the
+    command was queued for a connected vehicle, rejections (e.g. geofence) are
+    reported through the breach listeners. Vehicle positions are checked
+    against the geofence for the whole fleet at once from the fleet table.
+    If a worker process dies its
+    vehicles are marked disconnected and reported to the link lost listeners.
+    """
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self.connection_strings = []
+        self.geofence = None
+        self.breach_listeners = []
+        self.link_lost_listeners = []
+        self.table = None
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = []
+        self._command_queues = []
+        self._worker_of = []
+        self._events = None
+        self._event_thread = None
+        self._metrics = {}
+        self._lost_workers = set()
+        self._stopping = False
+        self._breached = {}
+
+    @property
+    def vehicles(self):
+        """Per vehicle True if connected, None otherwise (mirrors DroneController.vehicles)"""
+        if self.table is None:
+            return []
+        return [True if self.table.is_connected(i) else None for i in range(self.table.size)]
+
+    def add_vehicle(self, connection_string):
+        """Add a vehicle connection string to the list"""
+        self.connection_strings.append(connection_string)
+
+    def connect_vehicles(self):
+        """Start the worker processes and connect to all vehicles"""
+        count = len(self.connection_strings)
+        self.table = FleetTable(count)
+        self._events = self._context.Queue()
+
+        shards = [[] for _ in range(min(self.workers, count))]
+        self._worker_of = []
+        for i, conn_str in enumerate(self.connection_strings):
+            shards[i % len(shards)].append((i, conn_str))
+            self._worker_of.append(i % len(shards))
+
+        self._processes = []
+        self._command_queues = []
+        for links in shards:
+            commands = self._context.Queue()
+            process = self._context.Process(
+                target=_link_worker,
+                args=(self.table.name, count, links, commands, self._events),
+                daemon=True)
+            process.start()
+            self._processes.append(process)
+            self._command_queues.append(commands)
+
+        if self.geofence is not None:
+            self.set_geofence(self.geofence)
+
+        connected = set()
+        pending = set(range(count))
+        while pending:
+            try:
+                event = self._events.get(timeout=1)
+            except queue.Empty:
+                event = None
+            if event is None:
+                pass
+            elif event[0] == 'connected':
+                # The worker has already logged the result
+                pending.discard(event[1])
+                if event[2]:
+                    connected.add(event[1])
+            else:
+                self._dispatch_event(event)
+
+            for vehicle_index, reason in self._check_workers():
+                pending.discard(vehicle_index)
+                connected.discard(vehicle_index)
+                print(f"Failed to connect to vehicle {vehicle_index+1}: {reason}")
+
+        self._event_thread = threading.Thread(target=self._event_loop, args=(self._events,),
+                                              daemon=True)
+        self._event_thread.start()
+        if not connected:
+            # Nothing to keep the workers and the fleet table around for
+            self.disconnect_vehicles()
+        return len(connected)
+
+    def disconnect_vehicles(self):
+        """Stop the worker processes and disconnect all vehicles"""
+        # Workers exiting from here on are not failures
+        self._stopping = True
+        for commands in self._command_queues:
+            commands.put(('stop',))
+        for process in self._processes:
+            process.join(10)
+            if process.is_alive():
+                process.terminate()
+        if self._event_thread is not None:
+            self._event_thread.join(2)
+        if self.table is not None:
+            self.table.close()
+        self.table = None
+        self._processes = []
+        self._command_queues = []
+        self._worker_of = []
+        self._events = None
+        self._event_thread = None
+        self._metrics = {}
+        self._lost_workers = set()
+        self._stopping = False
+        self._breached = {}
+
+    def _event_loop(self, events):
+        # No stop sentinel over the queue: a killed worker can leave it locked
+        last_fence_check = time.monotonic()
+        while not self._stopping:
+            try:
+                event = events.get(timeout=FENCE_CHECK_INTERVAL)
+            except queue.Empty:
+                event = None
+            if event is not None:
+                self._dispatch_event(event)
+            now = time.monotonic()
+            if now - last_fence_check >= FENCE_CHECK_INTERVAL:
+                self._check_fleet_positions()
+                last_fence_check = now
+            for vehicle_index, reason in self._check_workers():
+                for callback in self.link_lost_listeners:
+                    callback(vehicle_index, reason)
+
+    def _check_fleet_positions(self):
+        """Check every vehicle position in the fleet table against the geofence"""
+        geofence = self.geofence
+        if geofence is None:
+            return
+        reasons = geofence.check_positions(self.table.positions())
+        for vehicle_index, reason in enumerate(reasons):
+            breached = reason is not None
+            # Only report when a vehicle leaves the fence, not on every check
+            if breached and not self._breached.get(vehicle_index):
+                for callback in self.breach_listeners:
+                    callback(vehicle_index, 'position', reason)
+            self._breached[vehicle_index] = breached
+
+    def _check_workers(self):
+        """
+        Mark the vehicles of worker processes that died as disconnected.
+        Returns (vehicle_index, reason) for every vehicle newly lost.
+        """
+        lost = []
+        if self._stopping:
+            return lost
+        for worker, process in enumerate(self._processes):
+            if worker in self._lost_workers or process.is_alive():
+                continue
+            self._lost_workers.add(worker)
+            reason = f"link worker exited with code {process.exitcode}"
+            for vehicle_index, owner in enumerate(self._worker_of):
+                if owner == worker:
+                    self.table.write(vehicle_index, None)
+                    lost.append((vehicle_index, reason))
+        return lost
+
+    def _dispatch_event(self, event):
+        if event[0] == 'breach':
+            _, vehicle_index, kind, reason = event
+            for callback in self.breach_listeners:
+                callback(vehicle_index, kind, reason)
+        elif event[0] == 'metrics':
+            self._metrics[event[1]] = event[2]
+
+    def _call(self, vehicle_index, method, *args):
+        """Forward a DroneController call to the worker owning the vehicle"""
+        if self.table is None or vehicle_index >= self.table.size \
+                or not self.table.is_connected(vehicle_index):
+            return False
+        worker = self._worker_of[vehicle_index]
+        if worker in self._lost_workers or not self._processes[worker].is_alive():
+            return False
+        self._command_queues[worker].put(('call', vehicle_index, method, args))
+        return True
+
+    def set_geofence(self, geofence):
+        """Set the geofence used by all workers (None to disable)"""
+        self.geofence = geofence
+        self._breached = {}
+        for commands in self._command_queues:
+            commands.put(('geofence', geofence))
+
+    def add_breach_listener(self, callback):
+        """Register a callback for geofence breaches, see DroneController.add_breach_listener"""
+        self.breach_listeners.append(callback)
+
+    def add_link_lost_listener(self, callback):
+        """
+        Register a callback for vehicles lost because their worker process died.
+        Called as callback(vehicle_index, reason) from the event thread.
+        """
+        self.link_lost_listeners.append(callback)
+
+    def arm_vehicle(self, vehicle_index):
+        """Arm a specific vehicle"""
+        # Workers must not block on the arm wait, poll the fleet table here instead
+        if not self._call(vehicle_index, 'arm_vehicle', 0):
+            return False
+
+        # Wait until armed
+        timeout = 10
+        start_time = time.time()
+        while (time.time() - start_time) < timeout:
+            try:
+                status = self.table.read(vehicle_index)
+            except RowUnreadable:
+                # Row is being written, it says nothing about the arm state
+                time.sleep(0.2)
+                continue
+            if status is None or status['armed']:
+                return status is not None
+            time.sleep(0.2)
+        return False
+
+    def disarm_vehicle(self, vehicle_index):
+        """Disarm a specific vehicle"""
+        return self._call(vehicle_index, 'disarm_vehicle')
+
+    def takeoff_vehicle(self, vehicle_index, altitude):
+        """Takeoff a specific vehicle to specified altitude"""
+        try:
+            status = self._read_status(vehicle_index)
+        except RowUnreadable:
+            # The worker checks the armed state itself before taking off
+            return self._call(vehicle_index, 'takeoff_vehicle', altitude)
+        if status and status['armed']:
+            return self._call(vehicle_index, 'takeoff_vehicle', altitude)
+        return False
+
+    def land_vehicle(self, vehicle_index):
+        """Land a specific vehicle"""
+        return self._call(vehicle_index, 'land_vehicle')
+
+    def rtl_vehicle(self, vehicle_index):
+        """Return to launch for a specific vehicle"""
+        return self._call(vehicle_index, 'rtl_vehicle')
+
+    def _read_status(self, vehicle_index):
+        """
+        Read a vehicle's fleet table row, None if it is not connected.
+        A row being written is retried for up to READ_TIMEOUT before
+        RowUnreadable is raised.
+        """
+        if self.table is None or vehicle_index >= self.table.size:
+            return None
+        deadline = time.monotonic() + READ_TIMEOUT
+        while True:
+            try:
+                return self.table.read(vehicle_index)
+            except RowUnreadable:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.01)
+
+    def get_vehicle_status(self, vehicle_index):
+        """
+        Get status information for a specific vehicle from the fleet table.
+        Returns None if it is not connected or its row could not be read this time.
+        """
+        if self.table is None or vehicle_index >= self.table.size:
+            return None
+        try:
+            return self.table.read(vehicle_index)
+        except RowUnreadable:
+            return None
+
+    def get_link_metrics(self, vehicle_index):
+        """Get the last outbound queue metrics reported by the worker for a vehicle link"""
+        return self._metrics.get(vehicle_index)
+
+    def send_ned_to_vehicle(self, vehicle_index, x, y, z):
+        """Send NED position command to specific vehicle"""
+        return self._call(vehicle_index, 'send_ned_to_vehicle', x, y, z)
+
+    def yaw_to_target(self, vehicle_index, target_lat, target_lon):
+        """
+        Yaw vehicle to target location, returns the bearing computed from the fleet table.
+        Nothing is sent if the vehicle position cannot be read.
+        """
+        try:
+            status = self._read_status(vehicle_index)
+        except RowUnreadable:
+            return None
+        if status is None or status['lat'] is None:
+            return None
+        if not self._call(vehicle_index, 'yaw_to_target', target_lat, target_lon):
+            return None
+        bearing = calculate_bearing(LocationGlobalRelative(status['lat'], status['lon'], 0),
+                                    LocationGlobalRelative(target_lat, target_lon, 0))
+        return math.degrees(bearing)
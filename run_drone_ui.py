@@ -9,15 +9,16 @@ import os
 # Add current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-try:
-    from drone_ui import main
-    print("Starting Drone Control UI...")
-    main()
-except ImportError as e:
-    print(f"Import error: {e}")
-    print("Please make sure all dependencies are installed:")
-    print("pip install -r requirements.txt")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error starting application: {e}")
-    sys.exit(1)
\ No newline at end of file
+if __name__ == "__main__":
+    try:
+        from drone_ui import main
+        print("Starting Drone Control UI...")
+        main()
+    except ImportError as e:
+        print(f"Import error: {e}")
+        print("Please make sure all dependencies are installed:")
+        print("pip install -r requirements.txt")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error starting application: {e}")
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,11 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The application modules live in the repository root. dronekit and pymavlink
+# are replaced by the stubs so the controllers can run without a vehicle; being
+# on sys.path (rather than only in sys.modules) lets spawned link workers use
+# them too.
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, os.path.join(TESTS_DIR, 'stubs'))
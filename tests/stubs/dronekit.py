@@ -0,0 +1,65 @@
+"""
+Minimal stand-in for dronekit used by the tests.
+
+connect() accepts "stub" or "stub:lat,lon,alt" connection strings and
+raises for anything else. Vehicles record what was sent to them.
+"""
+
+
+class VehicleMode(str):
+    pass
+
+
+class LocationGlobalRelative:
+    def __init__(self, lat, lon, alt=None):
+        self.lat = lat
+        self.lon = lon
+        self.alt = alt
+
+
+class _Location:
+    def __init__(self, lat=None, lon=None, alt=None):
+        self.global_relative_frame = LocationGlobalRelative(lat, lon, alt)
+
+
+class _MessageFactory:
+    def set_position_target_local_ned_encode(self, *args):
+        return ('SET_POSITION_TARGET_LOCAL_NED',) + args
+
+
+class StubVehicle:
+    def __init__(self, lat=None, lon=None, alt=None):
+        self.armed = False
+        self.mode = VehicleMode("STABILIZE")
+        self.location = _Location(lat, lon, alt)
+        self.battery = None
+        self.gps_0 = None
+        self.message_factory = _MessageFactory()
+        self.sent = []
+        self.listeners = {}
+        self.closed = False
+
+    def add_attribute_listener(self, name, callback):
+        self.listeners.setdefault(name, []).append(callback)
+
+    def notify(self, name, value):
+        for callback in self.listeners.get(name, []):
+            callback(self, name, value)
+
+    def send_mavlink(self, msg):
+        self.sent.append(msg)
+
+    def simple_takeoff(self, altitude):
+        self.sent.append(('takeoff', altitude))
+
+    def close(self):
+        self.closed = True
+
+
+def connect(connection_string, **kwargs):
+    if connection_string == 'stub':
+        return StubVehicle()
+    if connection_string.startswith('stub:'):
+        lat, lon, alt = (float(value) for value in connection_string[5:].split(','))
+        return StubVehicle(lat, lon, alt)
+    raise ConnectionError(f"cannot connect to {connection_string}")
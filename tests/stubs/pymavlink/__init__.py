@@ -0,0 +1 @@
+"""Minimal stand-in for pymavlink used by the tests"""
@@ -0,0 +1,2 @@
+class mavlink:
+    MAV_FRAME_LOCAL_OFFSET_NED = 7
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from command_scheduler import (CommandScheduler, PRIORITY_SAFETY, PRIORITY_MODE,
+                               PRIORITY_SETPOINT, PRIORITY_BULK)
+
+
+NO_RATE_LIMITS = {PRIORITY_SAFETY: 0.0, PRIORITY_MODE: 0.0,
+                  PRIORITY_SETPOINT: 0.0, PRIORITY_BULK: 0.0}
+
+
+def blocked_scheduler():
+    """Start a scheduler whose sender thread is held by a first command until released"""
+    scheduler = CommandScheduler("test", rate_limits=NO_RATE_LIMITS)
+    scheduler.start()
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold, PRIORITY_BULK)
+    assert started.wait(5)
+    return scheduler, release
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_commands_are_sent_in_priority_order():
+    scheduler, release = blocked_scheduler()
+    sent = []
+    scheduler.submit(lambda: sent.append('bulk'), PRIORITY_BULK)
+    scheduler.submit(lambda: sent.append('setpoint'), PRIORITY_SETPOINT)
+    scheduler.submit(lambda: sent.append('mode'), PRIORITY_MODE)
+    release.set()
+
+    assert wait_for(lambda: len(sent) == 3)
+    assert sent == ['mode', 'setpoint', 'bulk']
+    scheduler.stop()
+
+
+def test_setpoints_with_same_key_are_coalesced():
+    scheduler, release = blocked_scheduler()
+    sent = []
+    for i in range(5):
+        scheduler.submit(lambda i=i: sent.append(('position', i)), PRIORITY_SETPOINT, key='position')
+    scheduler.submit(lambda: sent.append(('yaw', 0)), PRIORITY_SETPOINT, key='yaw')
+    release.set()
+
+    assert wait_for(lambda: len(sent) == 2)
+    assert sent == [('position', 4), ('yaw', 0)]
+    assert scheduler.metrics()['setpoint']['coalesced'] == 4
+    scheduler.stop()
+
+
+def test_safety_command_drops_lower_priority_commands():
+    scheduler, release = blocked_scheduler()
+    modes = []
+    scheduler.submit(lambda: modes.append('GUIDED'), PRIORITY_MODE)
+    scheduler.submit(lambda: modes.append('armed=True'), PRIORITY_MODE)
+    scheduler.submit(lambda: modes.append('GUIDED'), PRIORITY_MODE)
+    scheduler.submit(lambda: modes.append('setpoint'), PRIORITY_SETPOINT, key='position')
+    scheduler.submit(lambda: modes.append('LAND'), PRIORITY_SAFETY)
+    release.set()
+
+    assert wait_for(lambda: 'LAND' in modes)
+    time.sleep(0.1)
+    assert modes == ['LAND']
+    metrics = scheduler.metrics()
+    assert metrics['mode']['dropped'] == 3
+    assert metrics['setpoint']['dropped'] == 1
+    scheduler.stop()
+
+
+def test_land_is_last_mode_sent():
+    scheduler = CommandScheduler("test", rate_limits=NO_RATE_LIMITS)
+    scheduler.start()
+    modes = []
+    for mode in ['GUIDED', 'GUIDED', 'LOITER']:
+        scheduler.submit(lambda mode=mode: modes.append(mode), PRIORITY_MODE)
+    scheduler.submit(lambda: modes.append('LAND'), PRIORITY_SAFETY)
+
+    assert wait_for(lambda: 'LAND' in modes)
+    time.sleep(0.1)
+    assert modes[-1] == 'LAND'
+    scheduler.stop()
+
+
+def test_stop_sends_queued_safety_commands():
+    scheduler, release = blocked_scheduler()
+    sent = []
+    scheduler.submit(lambda: sent.append('RTL'), PRIORITY_SAFETY)
+    scheduler.submit(lambda: sent.append('bulk'), PRIORITY_BULK)
+    threading.Timer(0.1, release.set).start()
+    scheduler.stop()
+
+    assert sent == ['RTL']
+    assert not scheduler.submit(lambda: sent.append('late'), PRIORITY_SAFETY)
+
+
+def test_failed_sends_are_counted():
+    scheduler = CommandScheduler("test", rate_limits=NO_RATE_LIMITS)
+    scheduler.start()
+
+    def fail():
+        raise RuntimeError("link down")
+
+    scheduler.submit(fail, PRIORITY_MODE)
+    assert wait_for(lambda: scheduler.metrics()['mode']['failed'] == 1)
+    assert scheduler.metrics()['mode']['depth'] == 0
+    scheduler.stop()
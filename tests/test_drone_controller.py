@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from drone_controller import DroneController
+from geofence import Geofence
+
+
+# Roughly 1.1 km square, vehicles start near its middle
+FENCE = [(40.0, 30.0), (40.0, 30.013), (40.01, 30.013), (40.01, 30.0)]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def controller():
+    controller = DroneController()
+    controller.breaches = []
+    controller.add_breach_listener(lambda *breach: controller.breaches.append(breach))
+    yield controller
+    controller.disconnect_vehicles()
+
+
+def connect(controller, *connection_strings):
+    for connection_string in connection_strings:
+        controller.add_vehicle(connection_string)
+    controller.connect_vehicles()
+    return controller.vehicles
+
+
+def move(vehicle, lat, lon, alt):
+    location = vehicle.location.global_relative_frame
+    location.lat, location.lon, location.alt = lat, lon, alt
+    vehicle.notify('location.global_relative_frame', location)
+
+
+def test_failed_connection_leaves_empty_slot(controller):
+    vehicles = connect(controller, 'stub', 'unreachable')
+    assert vehicles[0] is not None and vehicles[1] is None
+    assert not controller.land_vehicle(1)
+
+
+def test_ned_without_fence_or_position_fix(controller):
+    vehicle, = connect(controller, 'stub')
+    assert controller.send_ned_to_vehicle(0, 5, 0, -2)
+    assert wait_for(lambda: len(vehicle.sent) == 1)
+    assert vehicle.sent[0][6:9] == (5, 0, -2)
+
+
+def test_fence_rejects_setpoints_without_position_fix(controller):
+    vehicle, = connect(controller, 'stub')
+    controller.set_geofence(Geofence([FENCE]))
+    assert not controller.send_ned_to_vehicle(0, 5, 0, -2)
+    vehicle.armed = True
+    assert not controller.takeoff_vehicle(0, 10)
+    assert controller.breaches == [(0, 'setpoint', "no position fix")] * 2
+    time.sleep(0.1)
+    assert vehicle.sent == []
+
+
+def test_ned_setpoint_is_projected_from_current_position(controller):
+    vehicle, = connect(controller, 'stub:40.005,30.0065,10')
+    controller.set_geofence(Geofence([FENCE], max_altitude=100))
+
+    assert controller.send_ned_to_vehicle(0, 400, 0, -5)
+    assert not controller.send_ned_to_vehicle(0, 700, 0, -5)
+    assert not controller.send_ned_to_vehicle(0, 0, -700, -5)
+    # Target altitude is the current altitude minus the down offset
+    assert not controller.send_ned_to_vehicle(0, 0, 0, -95)
+    assert controller.breaches == [
+        (0, 'setpoint', "outside inclusion zone"),
+        (0, 'setpoint', "outside inclusion zone"),
+        (0, 'setpoint', "altitude 105.0m above limit 100.0m"),
+    ]
+    assert wait_for(lambda: len(vehicle.sent) == 1)
+
+
+def test_takeoff_checks_requested_altitude(controller):
+    vehicle, = connect(controller, 'stub:40.005,30.0065,0')
+    vehicle.armed = True
+    controller.set_geofence(Geofence([FENCE], max_altitude=100))
+
+    assert not controller.takeoff_vehicle(0, 150)
+    assert controller.takeoff_vehicle(0, 50)
+    assert controller.breaches == [(0, 'setpoint', "altitude 150.0m above limit 100.0m")]
+    assert wait_for(lambda: vehicle.sent == [('takeoff', 50)])
+
+
+def test_position_breach_reported_when_leaving_fence(controller):
+    vehicle, = connect(controller, 'stub:40.005,30.0065,10')
+    controller.set_geofence(Geofence([FENCE]))
+
+    move(vehicle, 40.005, 30.0065, 10)
+    move(vehicle, 40.02, 30.0065, 10)
+    move(vehicle, 40.03, 30.0065, 10)
+    assert controller.breaches == [(0, 'position', "outside inclusion zone")]
+
+    move(vehicle, 40.005, 30.0065, 10)
+    move(vehicle, 40.02, 30.0065, 10)
+    assert len(controller.breaches) == 2
+
+
+def test_set_geofence_resets_breach_state(controller):
+    vehicle, = connect(controller, 'stub:40.005,30.0065,10')
+    controller.set_geofence(Geofence([FENCE]))
+    move(vehicle, 40.02, 30.0065, 10)
+    assert len(controller.breaches) == 1
+
+    controller.set_geofence(Geofence([FENCE]))
+    move(vehicle, 40.02, 30.0065, 10)
+    assert len(controller.breaches) == 2
+
+    controller.set_geofence(None)
+    move(vehicle, 40.03, 30.0065, 10)
+    assert len(controller.breaches) == 2
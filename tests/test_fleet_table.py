@@ -0,0 +1,89 @@
+import multiprocessing
+
+import pytest
+
+from fleet_table import FleetTable, RowUnreadable
+
+
+STATUS = {
+    'armed': True,
+    'mode': 'VehicleMode:GUIDED',
+    'altitude': 12.5,
+    'battery': 12.6,
+    'gps_fix': 3,
+    'satellites': 11,
+    'lat': 40.001,
+    'lon': 30.002,
+}
+
+
+@pytest.fixture
+def table():
+    table = FleetTable(3)
+    yield table
+    table.close()
+
+
+def write_status(name, size, index, status):
+    table = FleetTable(size, name=name)
+    table.write(index, status)
+    table.close()
+
+
+def test_rows_start_disconnected(table):
+    assert [table.read(i) for i in range(3)] == [None, None, None]
+    assert not table.is_connected(0)
+
+
+def test_write_read_round_trip(table):
+    table.write(1, STATUS)
+    assert table.read(1) == STATUS
+    assert table.is_connected(1)
+    assert table.read(0) is None
+
+
+def test_missing_position_and_disconnect(table):
+    table.write(0, dict(STATUS, lat=None, lon=None, altitude=None))
+    status = table.read(0)
+    assert status['lat'] is None and status['lon'] is None
+    assert status['altitude'] == 0
+
+    table.write(0, None)
+    assert table.read(0) is None
+    assert table.rows[0].seq % 2 == 0
+
+
+def test_long_mode_is_truncated(table):
+    table.write(0, dict(STATUS, mode='M' * 40))
+    assert table.read(0)['mode'] == 'M' * 31
+
+
+def test_torn_row_does_not_hang_reader(table):
+    table.write(2, STATUS)
+    # A writer killed in the middle of an update leaves the sequence odd
+    table.rows[2].seq += 1
+    with pytest.raises(RowUnreadable):
+        table.read(2)
+    # Unlike a disconnected row, which reads as None
+    assert table.is_connected(2)
+    assert table.positions()[2] is None
+
+    # The next write recovers the row
+    table.write(2, STATUS)
+    assert table.rows[2].seq % 2 == 0
+    assert table.read(2) == STATUS
+
+
+def test_write_from_other_process(table):
+    context = multiprocessing.get_context('spawn')
+    process = context.Process(target=write_status, args=(table.name, table.size, 1, STATUS))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    assert table.read(1) == STATUS
+
+
+def test_positions(table):
+    table.write(0, STATUS)
+    table.write(1, dict(STATUS, lat=None, lon=None))
+    assert table.positions() == [(40.001, 30.002, 12.5), None, None]
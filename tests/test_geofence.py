@@ -0,0 +1,132 @@
+import json
+import math
+import random
+
+import pytest
+
+from geofence import Geofence, offset_position, _ray_cast
+
+
+# Roughly 1.1 km square with a 220 m square hole in the middle
+INCLUSION = [(40.0, 30.0), (40.0, 30.013), (40.01, 30.013), (40.01, 30.0)]
+EXCLUSION = [(40.004, 30.005), (40.004, 30.008), (40.006, 30.008), (40.006, 30.005)]
+
+
+def brute_force_check(geofence, inclusion, exclusion, lat, lon):
+    """Reference answer from a plain ray cast over every polygon edge"""
+    x, y = geofence._project(lat, lon)
+
+    def inside(polygon):
+        points = [geofence._project(*vertex) for vertex in polygon]
+        edges = [points[i] + points[(i + 1) % len(points)] for i in range(len(points))]
+        return _ray_cast(x, y, edges)
+
+    if any(inside(polygon) for polygon in exclusion):
+        return "inside exclusion zone"
+    if inclusion and not any(inside(polygon) for polygon in inclusion):
+        return "outside inclusion zone"
+    return None
+
+
+def star(center_lat, center_lon, radius, vertices, rng):
+    return [(center_lat + radius * (0.4 + 0.6 * rng.random()) * math.cos(2 * math.pi * i / vertices),
+             center_lon + radius * (0.4 + 0.6 * rng.random()) * math.sin(2 * math.pi * i / vertices))
+            for i in range(vertices)]
+
+
+def test_exclusion_inside_inclusion():
+    geofence = Geofence([INCLUSION], [EXCLUSION])
+    assert geofence.check(40.002, 30.002) is None
+    assert geofence.check(40.005, 30.0065) == "inside exclusion zone"
+    assert geofence.check(40.02, 30.002) == "outside inclusion zone"
+    assert geofence.check(39.0, 29.0) == "outside inclusion zone"
+
+
+def test_exclusion_only_fence_allows_everything_else():
+    geofence = Geofence(exclusion=[EXCLUSION])
+    assert geofence.check(40.005, 30.0065) == "inside exclusion zone"
+    assert geofence.check(40.002, 30.002) is None
+    assert geofence.check(10.0, 10.0) is None
+
+
+def test_empty_fence_only_checks_altitude():
+    geofence = Geofence(min_altitude=0, max_altitude=120)
+    assert geofence.check(40.0, 30.0, 50) is None
+    assert geofence.check(40.0, 30.0, 150) == "altitude 150.0m above limit 120.0m"
+    assert geofence.check(40.0, 30.0, -1) == "altitude -1.0m below limit 0.0m"
+    assert geofence.check(40.0, 30.0) is None
+
+
+def test_polygons_need_three_vertices():
+    with pytest.raises(ValueError):
+        Geofence([[(40.0, 30.0), (40.0, 30.01)]])
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(1)
+    inclusion = [star(40.0, 30.0, 0.01, 40, rng)]
+    exclusion = [star(40.002, 30.001, 0.003, 12, rng), star(39.996, 29.997, 0.002, 7, rng)]
+    geofence = Geofence(inclusion, exclusion, grid_size=16)
+
+    for _ in range(5000):
+        lat = 40.0 + rng.uniform(-0.012, 0.012)
+        lon = 30.0 + rng.uniform(-0.012, 0.012)
+        assert geofence.check(lat, lon) == brute_force_check(geofence, inclusion, exclusion, lat, lon)
+
+
+def test_points_on_grid_edges_match_brute_force():
+    geofence = Geofence([INCLUSION], [EXCLUSION], grid_size=8)
+    n = geofence.grid_size
+
+    # Cell boundaries, including the far edges of the indexed bounding box
+    xs = [geofence._min_x + i * geofence._cell_w for i in range(n)] + [geofence._max_x]
+    ys = [geofence._min_y + i * geofence._cell_h for i in range(n)] + [geofence._max_y]
+    for x in xs:
+        for y in ys:
+            lat = geofence.origin_lat + y / geofence._y_scale
+            lon = geofence.origin_lon + x / geofence._x_scale
+            expected = brute_force_check(geofence, [INCLUSION], [EXCLUSION], lat, lon)
+            assert geofence.check(lat, lon) == expected
+            assert geofence.check_positions([(lat, lon, None)]) == [expected]
+
+
+def test_check_positions_matches_check():
+    rng = random.Random(2)
+    inclusion = [star(40.0, 30.0, 0.01, 40, rng)]
+    exclusion = [star(40.002, 30.001, 0.003, 12, rng)]
+    geofence = Geofence(inclusion, exclusion, min_altitude=0, max_altitude=100, grid_size=16)
+
+    positions = []
+    for _ in range(3000):
+        positions.append((40.0 + rng.uniform(-0.012, 0.012),
+                          30.0 + rng.uniform(-0.012, 0.012),
+                          rng.choice([None, 50, 150, -5])))
+    # Many vehicles sharing one cell, and vehicles without a position
+    positions += [(40.0021, 30.0011, 20)] * 20 + [None] * 3
+
+    expected = [geofence.check(*position) if position is not None else None
+                for position in positions]
+    assert geofence.check_positions(positions) == expected
+    assert geofence.check_positions([]) == []
+
+
+def test_from_file(tmp_path):
+    path = tmp_path / "fence.json"
+    path.write_text(json.dumps({
+        'inclusion': [[list(vertex) for vertex in INCLUSION]],
+        'exclusion': [[list(vertex) for vertex in EXCLUSION]],
+        'max_altitude': 60,
+    }))
+    geofence = Geofence.from_file(str(path))
+    assert geofence.check(40.002, 30.002, 30) is None
+    assert geofence.check(40.002, 30.002, 61) == "altitude 61.0m above limit 60.0m"
+    assert geofence.check(40.005, 30.0065, 30) == "inside exclusion zone"
+
+
+def test_offset_position():
+    lat, lon = offset_position(40.0, 30.0, 111.32, 0)
+    assert lat == pytest.approx(40.001, abs=1e-5)
+    assert lon == 30.0
+    lat, lon = offset_position(40.0, 30.0, 0, 100)
+    assert lat == 40.0
+    assert lon == pytest.approx(30.0 + 100 / (111319.5 * math.cos(math.radians(40.0))), abs=1e-6)
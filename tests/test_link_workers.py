@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+from fleet_table import FleetTable
+from geofence import Geofence
+from link_workers import MultiprocessDroneController
+
+
+FENCE = [(40.0, 30.0), (40.0, 30.013), (40.01, 30.013), (40.01, 30.0)]
+INSIDE = 'stub:40.005,30.0065,10'
+OUTSIDE = 'stub:40.02,30.0065,10'
+STATUS = {'armed': True, 'mode': 'GUIDED', 'altitude': 10.0, 'battery': 12.6,
+          'gps_fix': 3, 'satellites': 10, 'lat': 40.005, 'lon': 30.0065}
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+@pytest.fixture
+def controller():
+    controller = MultiprocessDroneController(workers=2)
+    controller.breaches = []
+    controller.add_breach_listener(lambda *breach: controller.breaches.append(breach))
+    yield controller
+    controller.disconnect_vehicles()
+
+
+def connect(controller, *connection_strings):
+    for connection_string in connection_strings:
+        controller.add_vehicle(connection_string)
+    return controller.connect_vehicles()
+
+
+def test_fleet_positions_checked_against_geofence(controller):
+    assert connect(controller, INSIDE, OUTSIDE, INSIDE) == 3
+    controller.set_geofence(Geofence([FENCE]))
+
+    assert wait_for(lambda: controller.breaches)
+    time.sleep(1.5)
+    # Reported once for the vehicle outside, not on every check
+    assert controller.breaches == [(1, 'position', "outside inclusion zone")]
+
+    controller.set_geofence(Geofence([FENCE]))
+    assert wait_for(lambda: len(controller.breaches) == 2)
+
+
+def run_controller(pids):
+    """Connect one stub vehicle, report the worker pid and wait to be killed"""
+    controller = MultiprocessDroneController(workers=1)
+    controller.add_vehicle('stub')
+    controller.connect_vehicles()
+    pids.put(controller._processes[0].pid)
+    time.sleep(60)
+
+
+def process_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # Zombies are waiting to be reaped, they no longer run
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/stat'), reason="needs /proc")
+def test_worker_exits_when_parent_dies():
+    context = multiprocessing.get_context('spawn')
+    pids = context.Queue()
+    parent = context.Process(target=run_controller, args=(pids,))
+    parent.start()
+    worker_pid = pids.get(timeout=30)
+    assert process_running(worker_pid)
+
+    parent.kill()
+    parent.join(10)
+    assert wait_for(lambda: not process_running(worker_pid))
+
+
+class FakeWorker:
+    def __init__(self):
+        self.alive = True
+
+    def is_alive(self):
+        return self.alive
+
+
+@pytest.fixture
+def offline_controller():
+    """Controller wired to in-process queues instead of worker processes"""
+    controller = MultiprocessDroneController(workers=2)
+    controller.table = FleetTable(3)
+    controller._processes = [FakeWorker(), FakeWorker()]
+    controller._command_queues = [queue.Queue(), queue.Queue()]
+    controller._worker_of = [0, 1, 0]
+    for i in range(3):
+        controller.table.write(i, dict(STATUS))
+    yield controller
+    controller.table.close()
+
+
+def queued(controller, worker):
+    commands = []
+    while not controller._command_queues[worker].empty():
+        commands.append(controller._command_queues[worker].get_nowait())
+    return commands
+
+
+def tear(controller, vehicle_index):
+    # What a writer killed in the middle of an update leaves behind
+    controller.table.rows[vehicle_index].seq |= 1
+
+
+def test_torn_row_is_not_reported_as_disconnected(offline_controller):
+    controller = offline_controller
+    tear(controller, 0)
+
+    assert controller.get_vehicle_status(0) is None
+    assert controller.vehicles[0] is True
+    # Takeoff is still queued, the worker checks the armed state itself
+    assert controller.takeoff_vehicle(0, 10)
+    assert queued(controller, 0) == [('call', 0, 'takeoff_vehicle', (10,))]
+    # Yaw needs the position for its bearing, nothing is sent without it
+    assert controller.yaw_to_target(0, 40.01, 30.0) is None
+    assert queued(controller, 0) == []
+
+
+def test_arm_waits_out_torn_row(offline_controller):
+    controller = offline_controller
+    controller.table.write(2, dict(STATUS, armed=False))
+    tear(controller, 2)
+    threading.Timer(0.5, controller.table.write, args=(2, dict(STATUS, armed=True))).start()
+
+    assert controller.arm_vehicle(2)
+    assert queued(controller, 0) == [('call', 2, 'arm_vehicle', (0,))]
+
+
+def test_links_sharded_round_robin(controller):
+    assert connect(controller, 'stub', 'stub', 'stub', 'stub') == 4
+    assert controller._worker_of == [0, 1, 0, 1]
+
+    assert controller.land_vehicle(1)
+    assert wait_for(lambda: controller.get_vehicle_status(1)['mode'] == 'LAND')
+    assert controller.get_vehicle_status(0)['mode'] == 'STABILIZE'
+
+    # Calls go to the queue of the worker owning the vehicle
+    command_queues = controller._command_queues
+    controller._command_queues = [queue.Queue(), queue.Queue()]
+    try:
+        assert controller.rtl_vehicle(2)
+        assert controller.send_ned_to_vehicle(3, 1, 2, -3)
+        assert queued(controller, 0) == [('call', 2, 'rtl_vehicle', ())]
+        assert queued(controller, 1) == [('call', 3, 'send_ned_to_vehicle', (1, 2, -3))]
+    finally:
+        controller._command_queues = command_queues
+
+
+def test_dead_worker_vehicles_marked_lost(controller):
+    lost = []
+    controller.add_link_lost_listener(lambda *event: lost.append(event))
+    assert connect(controller, 'stub', 'stub', 'stub') == 3
+
+    process = controller._processes[0]
+    process.kill()
+    process.join(5)
+
+    assert wait_for(lambda: len(lost) == 2)
+    reason = f"link worker exited with code {process.exitcode}"
+    assert sorted(lost) == [(0, reason), (2, reason)]
+    assert controller.get_vehicle_status(0) is None
+    assert controller.get_vehicle_status(2) is None
+    assert controller.vehicles == [None, True, None]
+    assert not controller.land_vehicle(0)
+    assert not controller._call(2, 'land_vehicle')
+    # The other worker keeps its vehicle
+    assert controller.get_vehicle_status(1) is not None
+    assert controller.land_vehicle(1)
+
+    # Reported once, not on every pass of the event thread
+    time.sleep(1.5)
+    assert len(lost) == 2